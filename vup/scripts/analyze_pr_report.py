@@ -6,15 +6,21 @@ Replaces the inline Python heredoc in vup-bot.yml.
 Usage: python3 analyze_pr_report.py --reports-dir reports --run-url <url> --output comment.md
 """
 import os
-import sys
 import json
-import glob
 import argparse
 import html
 
 
 def analyze(reports_dir, run_url):
-    reports = glob.glob(os.path.join(reports_dir, "*.json"))
+    try:
+        with os.scandir(reports_dir) as it:
+            reports = [
+                e.path
+                for e in it
+                if e.name.endswith(".json") and not e.name.startswith(".") and e.is_file()
+            ]
+    except FileNotFoundError:
+        reports = []
     summary = []
     failures = 0
 
@@ -4,51 +4,94 @@ import sys
 import subprocess
 import json
 import shutil
-import glob
 import time
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 
 # Import shared config
 try:
-    from config import NATIVE_ARCH, parse_template_archs, arch_supported
+    from config import (
+        NATIVE_ARCH,
+        arch_supported,
+        list_subdirs,
+        parse_template_archs,
+        parse_template_subpackages,
+    )
 except ImportError:
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from config import NATIVE_ARCH, parse_template_archs, arch_supported
+    from config import (
+        NATIVE_ARCH,
+        arch_supported,
+        list_subdirs,
+        parse_template_archs,
+        parse_template_subpackages,
+    )
 
 
-def run_command(cmd, log_file=None):
-    """Run a command and capture output to log_file if provided."""
+# Bytes of output kept in memory for the failure summary
+TAIL_BYTES = 16384
+
+
+def run_command(cmd, log_file=None, env=None, tail=None, echo=True):
+    """
+    Run a command and capture output to log_file if provided.
+    Output is copied in raw blocks rather than line by line. If tail is a
+    bytearray, it keeps the last TAIL_BYTES of output; it is only split
+    into lines if the caller needs them.
+    With echo=False the output only goes to log_file, not to stdout.
+    """
     print(f"Running: {' '.join(cmd)}")
     
     if log_file:
-        with open(log_file, "w") as f:
+        with open(log_file, "wb") as f:
             try:
                 # Pipe stdout/stderr to both file and current stdout
                 process = subprocess.Popen(
                     cmd, 
                     stdout=subprocess.PIPE, 
                     stderr=subprocess.STDOUT, 
-                    text=True
+                    env=env
                 )
                 
                 stdout = process.stdout
                 assert stdout is not None
-                for line in stdout:
-                    sys.stdout.write(line)
-                    f.write(line)
+                fd = stdout.fileno()
+                sys.stdout.flush()
+                out = sys.stdout.buffer
+                while True:
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        break
+                    if echo:
+                        out.write(chunk)
+                    f.write(chunk)
+                    if tail is not None:
+                        tail += chunk
+                        del tail[:-TAIL_BYTES]
+                out.flush()
                 
                 process.wait()
                 return process.returncode == 0
             except Exception as e:
-                f.write(f"\nError executing command: {e}\n")
+                msg = f"\nError executing command: {e}\n".encode()
+                f.write(msg)
+                if tail is not None:
+                    tail += msg
                 return False
     else:
-        return subprocess.call(cmd) == 0
+        return subprocess.call(cmd, env=env) == 0
+
+
+# Resolved once at import. Using the absolute path also lets subprocess exec
+# vuru directly instead of searching PATH again for every build.
+VURU = shutil.which("vuru")
 
 
 def has_vuru():
     """Check if vuru is available."""
-    return shutil.which("vuru") is not None
+    return VURU is not None
 
 
 def needs_alt_host(arch):
@@ -76,6 +119,233 @@ def ensure_alt_masterdir(arch):
     ) == 0
 
 
+def ensure_worker_masterdir(masterdir, arch):
+    """Bootstrap an extra masterdir for a concurrent build worker."""
+    if os.path.exists(os.path.join(masterdir, ".xbps_chroot_init")):
+        return True
+    print(f"[bootstrap] Creating {os.path.basename(masterdir)}...")
+    cmd = ["./xbps-src", "-m", masterdir]
+    if needs_alt_host(arch):
+        cmd += ["-A", arch]
+    return subprocess.call(cmd + ["binary-bootstrap"]) == 0
+
+
+def worker_masterdirs(arch, jobs):
+    """
+    Masterdirs for BUILD_JOBS concurrent builds. xbps-src keeps its chroot
+    state in the masterdir, so concurrent builds can't share one. The first
+    worker keeps the default masterdir (None); the others get their own.
+    hostdir/binpkgs is still shared, so main only runs more than one
+    worker for plain xbps-src builds, never through vuru src.
+    Note that masterdir-<arch>-workerN matches the void-packages/masterdir-*
+    path cached in build.yml, so each extra worker grows that cache by a
+    full bootstrapped chroot.
+    """
+    masterdirs = [None]
+    for n in range(1, jobs):
+        masterdir = os.path.abspath(f"masterdir-{arch}-worker{n}")
+        if ensure_worker_masterdir(masterdir, arch):
+            masterdirs.append(masterdir)
+        else:
+            print(f"Warning: could not bootstrap {masterdir}, running with fewer workers")
+    return masterdirs
+
+
+def build_command_prefix(arch):
+    """
+    Resolve the xbps-src invocation used for every package of this run.
+    The package name is appended per build.
+    """
+    if needs_alt_host(arch):
+        # Same-CPU different-libc: native build via -A <arch> in its own
+        # masterdir (e.g. masterdir-x86_64-musl), not cross-build via -a.
+        # vuru's wrapper doesn't accept -A, so we drive xbps-src directly.
+        # VUP dep resolution is skipped here — currently only matters for
+        # prebuilt-binary packages, which don't have VUP deps.
+        return ["./xbps-src", "-A", arch, "pkg"]
+    if has_vuru():
+        # Use vuru src if available - it handles VUP dependency resolution
+        # by downloading deps to hostdir/binpkgs before running xbps-src
+        if arch == NATIVE_ARCH:
+            return [VURU, "src", "pkg"]
+        return [VURU, "src", "-a", arch, "pkg"]
+    # Fallback to plain xbps-src
+    if arch == NATIVE_ARCH:
+        return ["./xbps-src", "pkg"]
+    return ["./xbps-src", "-a", arch, "pkg"]
+
+
+def link_or_copy(src, dst):
+    """
+    Hardlink a template file into the overlay instead of copying its bytes.
+    Templates aren't modified during a build, so sharing the inode is safe.
+    Falls back to a real copy across filesystems.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+# Overlays are renamed in here and deleted by a background thread
+TRASH_DIR = os.path.join("srcpkgs", ".trash")
+
+_trash_queue = Queue()
+_trash_thread = None
+
+
+def _empty_trash():
+    while True:
+        path = _trash_queue.get()
+        if path is None:
+            return
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def discard_tree(path):
+    """
+    Move a directory out of the way with a single rename and delete it on a
+    background thread, keeping rmtree off the build's critical path.
+    """
+    global _trash_thread
+    os.makedirs(TRASH_DIR, exist_ok=True)
+    target = os.path.join(TRASH_DIR, f"{os.path.basename(path)}-{time.time_ns()}")
+    os.rename(path, target)
+    if _trash_thread is None:
+        _trash_thread = threading.Thread(target=_empty_trash, daemon=True)
+        _trash_thread.start()
+    _trash_queue.put(target)
+
+
+def finish_trash():
+    """Wait for background deletions to finish and remove the trash dir."""
+    global _trash_thread
+    if _trash_thread is None:
+        return
+    _trash_queue.put(None)
+    _trash_thread.join()
+    _trash_thread = None
+    shutil.rmtree(TRASH_DIR, ignore_errors=True)
+
+
+def stage_overlay(vup_src_path, pkg):
+    """
+    Copy a package's template into srcpkgs/ for its build. The overlay is
+    built in a staging dir and renamed into place.
+    """
+    pkg_dest = os.path.join("srcpkgs", pkg)
+    staging = os.path.join("srcpkgs", f".staging-{pkg}")
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    shutil.copytree(os.path.join(vup_src_path, pkg), staging, copy_function=link_or_copy)
+    # Clean previous overlay
+    if os.path.exists(pkg_dest):
+        discard_tree(pkg_dest)
+    os.rename(staging, pkg_dest)
+
+
+def remove_overlay(pkg):
+    """Remove a package's staged template once its build is done."""
+    pkg_dest = os.path.join("srcpkgs", pkg)
+    if os.path.exists(pkg_dest):
+        discard_tree(pkg_dest)
+
+
+def build_one(pkg, arch, build_prefix, masterdir=None, echo=True):
+    """
+    Build a single staged package and return its report entry.
+    The full output always goes to build-logs/<pkg>.log; echo controls
+    whether it is also streamed to the console.
+    """
+    log_file = f"build-logs/{pkg}.log"
+    env = None
+    if masterdir:
+        env = dict(os.environ, XBPS_MASTERDIR=masterdir)
+
+    result_entry = {
+        "name": pkg,
+        "status": "pending",
+        "start_time": time.time()
+    }
+
+    print(f"[{pkg}] Building for {arch}...")
+    # End of the log, kept for the summary if the build fails
+    tail = bytearray()
+    success = run_command(build_prefix + [pkg], log_file=log_file, env=env, tail=tail, echo=echo)
+    
+    result_entry["end_time"] = time.time()
+    result_entry["duration"] = result_entry["end_time"] - result_entry["start_time"]
+    
+    if success:
+        print(f"[{pkg}] Build SUCCESS")
+        result_entry["status"] = "success"
+    else:
+        print(f"[{pkg}] Build FAILED")
+        result_entry["status"] = "failure"
+        # Extract last 30 lines of log for summary
+        lines = bytes(tail).splitlines(keepends=True)
+        result_entry["error_log"] = b"".join(lines[-30:]).decode(errors="replace")
+
+    return result_entry
+
+
+BINPKGS_DIR = os.path.join("hostdir", "binpkgs")
+
+# <pkgname>-<version>_<revision>.<arch>.xbps
+_BINPKG_RE = re.compile(r"^(.+)-[^-]+_[0-9]+\.[^.]+\.xbps$")
+
+
+def list_binpkgs():
+    """
+    Map every .xbps under hostdir/binpkgs to its (mtime_ns, size).
+    Comparing the listings from before and after the batch tells which
+    files its builds wrote, as opposed to leftovers from earlier runs.
+    """
+    listing = {}
+    for root, dirs, files in os.walk(BINPKGS_DIR):
+        for file in files:
+            if not file.endswith(".xbps"):
+                continue
+            path = os.path.join(root, file)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            listing[path] = (st.st_mtime_ns, st.st_size)
+    return listing
+
+
+def harvest_binpkgs(owners, before, after):
+    """
+    Copy the binpkgs written during the batch into dist/. owners maps the
+    pkgnames of successfully built packages and their subpackages to the
+    package that produced them; new or changed files with any other
+    pkgname (VUP deps vuru downloaded, output of failed builds) are left.
+    """
+    for path, sig in sorted(after.items()):
+        if before.get(path) == sig:
+            continue
+        match = _BINPKG_RE.match(os.path.basename(path))
+        pkg = owners.get(match.group(1)) if match else None
+        if pkg:
+            print(f"[{pkg}] Found binary: {path}")
+            os.makedirs("dist", exist_ok=True)
+            shutil.copy2(path, "dist/")
+
+
+def write_report(path, report):
+    """Write a build report as compact JSON (or indented if REPORT_INDENT is set)."""
+    try:
+        indent = max(0, int(os.environ.get("REPORT_INDENT", "0")))
+    except ValueError:
+        indent = 0
+    with open(path, "w") as f:
+        if indent:
+            json.dump(report, f, indent=indent)
+        else:
+            json.dump(report, f, separators=(",", ":"))
+
+
 def main():
     category = os.environ.get("CATEGORY")
     if not category:
@@ -94,8 +364,7 @@ def main():
         # If category is missing but explicitly requested, maybe it was deleted?
         # Just report nothing built.
         report = {"category": category, "results": []}
-        with open(f"report-{category}.json", "w") as f:
-            json.dump(report, f)
+        write_report(f"report-{category}.json", report)
         sys.exit(0)
 
     results = []
@@ -103,7 +372,7 @@ def main():
     # Ensure logs directory exists
     os.makedirs("build-logs", exist_ok=True)
 
-    all_packages = [p for p in os.listdir(vup_src_path) if os.path.isdir(os.path.join(vup_src_path, p))]
+    all_packages = list_subdirs(vup_src_path)
     all_packages.sort()
 
     packages_env = os.environ.get("PACKAGES", "ALL")
@@ -115,105 +384,89 @@ def main():
 
     print(f"Found {len(packages)} packages to build in {category}: {', '.join(packages)}")
 
+    # Filter by architecture up front so the batch below only holds
+    # packages that will actually be built.
+    eligible = []
     for pkg in packages:
-        pkg_src = os.path.join(vup_src_path, pkg)
-        pkg_dest = os.path.join("srcpkgs", pkg)
-        log_file = f"build-logs/{pkg}.log"
-        
-        # Check if this package supports the target architecture
-        template_path = os.path.join(pkg_src, "template")
+        template_path = os.path.join(vup_src_path, pkg, "template")
         pkg_archs = parse_template_archs(template_path)
         
         if not arch_supported(pkg_archs, arch):
             print(f"[{pkg}] Skipping - not supported on {arch} (archs: {pkg_archs})")
             continue
-        
-        result_entry = {
-            "name": pkg,
-            "status": "pending",
-            "start_time": time.time()
-        }
-
-        print(f"[{pkg}] Setup...")
-        # Clean previous overlay
-        if os.path.exists(pkg_dest):
-            shutil.rmtree(pkg_dest)
-        
-        # Copy new template
-        shutil.copytree(pkg_src, pkg_dest)
-
-        print(f"[{pkg}] Building for {arch}...")
-
-        if needs_alt_host(arch):
-            # Same-CPU different-libc: native build via -A <arch> in its own
-            # masterdir (e.g. masterdir-x86_64-musl), not cross-build via -a.
-            # vuru's wrapper doesn't accept -A, so we drive xbps-src directly.
-            # VUP dep resolution is skipped here — currently only matters for
-            # prebuilt-binary packages, which don't have VUP deps.
-            if not ensure_alt_masterdir(arch):
-                print(f"[{pkg}] FAILED to bootstrap masterdir-{arch}")
-                result_entry["status"] = "failure"
-                result_entry["end_time"] = time.time()
-                result_entry["duration"] = result_entry["end_time"] - result_entry["start_time"]
-                result_entry["error_log"] = f"Could not bootstrap masterdir-{arch}"
-                if os.path.exists(pkg_dest):
-                    shutil.rmtree(pkg_dest)
-                results.append(result_entry)
-                continue
-            build_cmd = ["./xbps-src", "-A", arch, "pkg", pkg]
-        elif has_vuru():
-            # Use vuru src if available - it handles VUP dependency resolution
-            # by downloading deps to hostdir/binpkgs before running xbps-src
-            if arch == NATIVE_ARCH:
-                build_cmd = ["vuru", "src", "pkg", pkg]
-            else:
-                build_cmd = ["vuru", "src", "-a", arch, "pkg", pkg]
-        else:
-            # Fallback to plain xbps-src
-            if arch == NATIVE_ARCH:
-                build_cmd = ["./xbps-src", "pkg", pkg]
-            else:
-                build_cmd = ["./xbps-src", "-a", arch, "pkg", pkg]
+        eligible.append(pkg)
 
-        success = run_command(build_cmd, log_file=log_file)
-        
-        result_entry["end_time"] = time.time()
-        result_entry["duration"] = result_entry["end_time"] - result_entry["start_time"]
-        
-        if success:
-            print(f"[{pkg}] Build SUCCESS")
-            result_entry["status"] = "success"
-        else:
-            print(f"[{pkg}] Build FAILED")
-            result_entry["status"] = "failure"
-            
-            # Extract last 30 lines of log for summary
+    # xbps-src's pkg target only takes a single package, so builds still run
+    # one invocation each. Masterdir bootstrap and command resolution are
+    # done once per batch. Each template is only staged in srcpkgs/ during
+    # its own build, so it can't shadow a void-packages template (or turn a
+    # sibling dependency into a source build) for the rest of the batch.
+    bootstrap_error = None
+    if eligible and needs_alt_host(arch) and not ensure_alt_masterdir(arch):
+        print(f"FAILED to bootstrap masterdir-{arch}")
+        bootstrap_error = f"Could not bootstrap masterdir-{arch}"
+
+    build_prefix = build_command_prefix(arch)
+
+    if bootstrap_error:
+        for pkg in eligible:
+            now = time.time()
+            results.append({
+                "name": pkg,
+                "status": "failure",
+                "start_time": now,
+                "end_time": now,
+                "duration": 0,
+                "error_log": bootstrap_error
+            })
+    elif eligible:
+        # Builds are independent, so they can overlap when BUILD_JOBS > 1.
+        # Threads are enough here: the work happens in the xbps-src child.
+        try:
+            jobs = max(1, int(os.environ.get("BUILD_JOBS", "1")))
+        except ValueError:
+            jobs = 1
+        if jobs > 1 and build_prefix[0] == VURU:
+            # After each build vuru src reindexes hostdir/binpkgs and deletes
+            # the VUP deps it downloaded plus <arch>-repodata, which would
+            # pull them out from under builds still running in other workers
+            print("BUILD_JOBS ignored: vuru src builds share hostdir/binpkgs")
+            jobs = 1
+        masterdirs = Queue()
+        for masterdir in worker_masterdirs(arch, min(jobs, len(eligible))):
+            masterdirs.put(masterdir)
+        # Concurrent builds would interleave their output mid-line, so the
+        # console only gets the per-package start/result lines then; the
+        # full output is in build-logs/<pkg>.log either way.
+        echo = masterdirs.qsize() == 1
+
+        # hostdir/binpkgs is listed once before and once after the batch
+        before = list_binpkgs()
+
+        def build_in_slot(pkg):
+            masterdir = masterdirs.get()
             try:
-                with open(log_file, "r") as f:
-                    lines = f.readlines()
-                    result_entry["error_log"] = "".join(lines[-30:])
-            except:
-                result_entry["error_log"] = "Could not read log file."
+                stage_overlay(vup_src_path, pkg)
+                try:
+                    result = build_one(pkg, arch, build_prefix, masterdir, echo)
+                finally:
+                    remove_overlay(pkg)
+            finally:
+                masterdirs.put(masterdir)
+            return result
 
-        # Clean up
-        if os.path.exists(pkg_dest):
-            shutil.rmtree(pkg_dest)
+        with ThreadPoolExecutor(max_workers=masterdirs.qsize()) as pool:
+            results.extend(pool.map(build_in_slot, eligible))
 
         # Move binpkgs on success
-        if success:
-            found_bins = []
-            # Recursively find all binpkgs for this package
-            for root, dirs, files in os.walk("hostdir/binpkgs"):
-                for file in files:
-                    if file.startswith(f"{pkg}-") and file.endswith(".xbps"):
-                        found_bins.append(os.path.join(root, file))
-
-            os.makedirs("dist", exist_ok=True)
-            for b in found_bins:
-                 print(f"[{pkg}] Found binary: {b}")
-                 shutil.copy2(b, "dist/")
-                 
-        results.append(result_entry)
+        owners = {}
+        for r in results:
+            if r["status"] == "success":
+                pkg = r["name"]
+                template_path = os.path.join(vup_src_path, pkg, "template")
+                for name in [pkg] + parse_template_subpackages(template_path):
+                    owners[name] = pkg
+        harvest_binpkgs(owners, before, list_binpkgs())
 
     # Write Report
     report = {
@@ -222,8 +475,9 @@ def main():
         "results": results
     }
     
-    with open(f"report-{category}-{arch}.json", "w") as f:
-        json.dump(report, f, indent=2)
+    # Read by generate_summary.py; REPORT_INDENT=2 pretty-prints it for debugging
+    write_report(f"report-{category}-{arch}.json", report)
+    finish_trash()
 
 if __name__ == "__main__":
     main()
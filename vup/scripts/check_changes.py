@@ -3,13 +3,53 @@ import os
 import subprocess
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Import shared config
 try:
-    from config import SUPPORTED_ARCHS, parse_template_archs, get_positive_archs
+    from config import SUPPORTED_ARCHS, parse_template_archs, get_positive_archs, get_build_archs, list_subdirs
 except ImportError:
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from config import SUPPORTED_ARCHS, parse_template_archs, get_positive_archs
+    from config import SUPPORTED_ARCHS, parse_template_archs, get_positive_archs, get_build_archs, list_subdirs
+
+# Changes under these paths only need a canary smoke build per category
+SMOKE_PREFIXES = (".github/workflows/", "vup/scripts/")
+# Changes under these paths need a full rebuild
+GLOBAL_PREFIXES = ("common/", "vup/common/")
+SRCPKGS_PREFIX = "vup/srcpkgs/"
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+
+def diff_names(old, new, merge_base=False):
+    """
+    List the files changed between two revisions, like
+    `git diff --name-only old new` (or `old...new` when merge_base is set).
+    Uses pygit2 in-process when it is installed, otherwise shells out to git.
+    Raises subprocess.CalledProcessError if the diff can't be computed.
+    """
+    if pygit2 is not None:
+        try:
+            repo = pygit2.Repository(".")
+            old_commit = repo.revparse_single(old).peel(pygit2.Commit)
+            new_commit = repo.revparse_single(new).peel(pygit2.Commit)
+            old_id = old_commit.id
+            if merge_base:
+                old_id = repo.merge_base(old_commit.id, new_commit.id)
+            diff = repo.diff(repo[old_id], new_commit)
+            # git diff detects renames by default and lists only the new path
+            diff.find_similar()
+            return [delta.new_file.path for delta in diff.deltas]
+        except Exception as e:
+            print(f"Warning: pygit2 diff failed ({e}), falling back to git")
+
+    rev = f"{old}...{new}" if merge_base else None
+    cmd = ["git", "diff", "--name-only"] + ([rev] if rev else [old, new])
+    return subprocess.check_output(cmd).decode().splitlines()
+
 
 def get_changes():
     event = os.environ.get("GITHUB_EVENT_NAME")
@@ -20,10 +60,7 @@ def get_changes():
         # PR: diff against the base branch (origin/main)
         try:
             subprocess.check_call(["git", "fetch", "origin", "main"])
-            output = subprocess.check_output(
-                ["git", "diff", "--name-only", "origin/main...HEAD"]
-            ).decode()
-            return output.splitlines()
+            return diff_names("origin/main", "HEAD", merge_base=True)
         except subprocess.CalledProcessError:
             return "ALL"
 
@@ -32,16 +69,18 @@ def get_changes():
     sha = os.environ.get("GITHUB_SHA")
 
     if not before or before == "0000000000000000000000000000000000000000":
-        cmd = ["git", "diff", "--name-only", "HEAD~1", "HEAD"]
-    else:
-        cmd = ["git", "diff", "--name-only", before, sha]
+        before, sha = "HEAD~1", "HEAD"
 
     try:
-        output = subprocess.check_output(cmd).decode()
+        return diff_names(before, sha)
     except subprocess.CalledProcessError:
         return "ALL"
 
-    return output.splitlines()
+def template_archs(template_path):
+    """Architectures a single package needs builds for (none if it has no template)."""
+    if not os.path.exists(template_path):
+        return []
+    return get_build_archs(parse_template_archs(template_path))
 
 def get_category_archs(category_path, packages=None):
     """
@@ -58,19 +97,14 @@ def get_category_archs(category_path, packages=None):
         pkg_list = packages
     else:
         # Scan all packages in category
-        pkg_list = [d for d in os.listdir(category_path) 
-                    if os.path.isdir(os.path.join(category_path, d))]
+        pkg_list = list_subdirs(category_path)
     
-    for pkg in pkg_list:
-        template_path = os.path.join(category_path, pkg, "template")
-        if os.path.exists(template_path):
-            raw_archs = parse_template_archs(template_path)
-            pkg_archs = get_positive_archs(raw_archs)
-            if pkg_archs:
+    template_paths = [os.path.join(category_path, pkg, "template") for pkg in pkg_list]
+    if template_paths:
+        # Template reads are small and syscall-bound, so overlap them
+        with ThreadPoolExecutor(max_workers=min(32, len(template_paths))) as pool:
+            for pkg_archs in pool.map(template_archs, template_paths):
                 archs.update(pkg_archs)
-            else:
-                # No archs specified means it builds for all supported
-                archs.update(SUPPORTED_ARCHS)
     
     return sorted(list(archs)) if archs else SUPPORTED_ARCHS
 
@@ -82,8 +116,7 @@ def pick_canary(category_path):
     if not os.path.isdir(category_path):
         return None
 
-    pkgs = sorted(d for d in os.listdir(category_path)
-                  if os.path.isdir(os.path.join(category_path, d)))
+    pkgs = sorted(list_subdirs(category_path))
     if not pkgs:
         return None
 
@@ -121,45 +154,50 @@ def main():
         print("vup/srcpkgs not found")
         sys.exit(0)
 
-    all_cats = [d for d in os.listdir("vup/srcpkgs") if os.path.isdir(os.path.join("vup/srcpkgs", d))]
+    # Categories are only listed once something actually needs them
+    all_cats = None
+
+    def categories():
+        nonlocal all_cats
+        if all_cats is None:
+            all_cats = list_subdirs("vup/srcpkgs")
+        return all_cats
 
     target_cats = set()
     cat_pkgs = {}
     build_all = False
     smoke_only = False
 
-    if changes == "ALL":
+    # Check for global changes that legitimately need a full rebuild
+    if changes == "ALL" or any(f.startswith(GLOBAL_PREFIXES) for f in changes):
         build_all = True
     else:
+        cat_set = None
         for f in changes:
-            if f.startswith(".github/workflows/") or f.startswith("vup/scripts/"):
+            if f.startswith(SMOKE_PREFIXES):
                 smoke_only = True
 
-            # Check for global changes that legitimately need a full rebuild
-            if f.startswith("common/") or f.startswith("vup/common/"):
-                build_all = True
-                break
-
             # Check for category changes
             # Expected path: vup/srcpkgs/<category>/<pkg>/...
-            if f.startswith("vup/srcpkgs/"):
-                parts = f.split("/")
-                if len(parts) > 2 and parts[2] in all_cats:
-                    cat = parts[2]
+            if f.startswith(SRCPKGS_PREFIX):
+                cat, _, tail = f[len(SRCPKGS_PREFIX):].partition("/")
+                if cat_set is None:
+                    cat_set = set(categories())
+                if cat in cat_set:
                     target_cats.add(cat)
 
                     if cat not in cat_pkgs:
                         cat_pkgs[cat] = set()
 
-                    if len(parts) > 3:
-                        cat_pkgs[cat].add(parts[3])
+                    if tail:
+                        cat_pkgs[cat].add(tail.partition("/")[0])
 
     if build_all:
         smoke_only = False
 
     if smoke_only:
         overrides = load_canary_overrides()
-        for cat in all_cats:
+        for cat in categories():
             target_cats.add(cat)
             cat_path = os.path.join("vup/srcpkgs", cat)
             canary = overrides.get(cat) or pick_canary(cat_path)
@@ -170,7 +208,7 @@ def main():
                 print(f"[smoke] {cat}: canary={canary}")
 
     if build_all:
-        target_list = sorted(list(set(all_cats)))
+        target_list = sorted(categories())
     else:
         target_list = sorted(list(target_cats))
     
@@ -4,7 +4,9 @@ Shared configuration for VUP build scripts.
 Edit these values to customize supported architectures and other settings.
 """
 
+import os
 import re
+from functools import lru_cache
 
 # Supported architectures for building
 # These are used as defaults when a template doesn't specify archs
@@ -22,26 +24,71 @@ BASE_URL = f"https://github.com/{REPO_OWNER}/{REPO_NAME}/releases/download"
 SRCPKGS_DIR = "vup/srcpkgs"
 
 
+def list_subdirs(path):
+    """
+    Return the names of the directories directly under path.
+    Uses os.scandir so the entry type usually comes from the directory
+    listing itself instead of one stat() per entry.
+    """
+    with os.scandir(path) as it:
+        return [entry.name for entry in it if entry.is_dir()]
+
+
+# Match archs="..." or archs='...'
+_ARCHS_RE = re.compile(r'^archs=["\']([^"\']+)["\']', re.MULTILINE)
+
+# Template headers fit comfortably in this; most templates are smaller.
+TEMPLATE_HEAD_SIZE = 4096
+
+
+@lru_cache(maxsize=None)
+def _read_template_archs(template_path, mtime_ns):
+    """Cached worker for parse_template_archs, keyed on path and mtime."""
+    with open(template_path, "r") as f:
+        content = f.read(TEMPLATE_HEAD_SIZE)
+        match = _ARCHS_RE.search(content)
+        # Templates are sourced shell, so archs may be set anywhere;
+        # read the rest whenever the head doesn't have it
+        if not match and len(content) == TEMPLATE_HEAD_SIZE:
+            match = _ARCHS_RE.search(content + f.read())
+    return tuple(match.group(1).split()) if match else None
+
+
 def parse_template_archs(template_path):
     """
     Parse the 'archs' field from a template file.
     Returns a list of supported architectures, or None if not specified (means all archs).
+    Results are cached per (path, mtime), so repeated scans of a category are cheap.
     """
     try:
-        with open(template_path, "r") as f:
-            content = f.read()
-
-        # Match archs="..." or archs='...'
-        match = re.search(r'^archs=["\']([^"\']+)["\']', content, re.MULTILINE)
-        if match:
-            archs_str = match.group(1)
-            return archs_str.split()
+        mtime_ns = os.stat(template_path).st_mtime_ns
+        archs = _read_template_archs(template_path, mtime_ns)
+        if archs is not None:
+            return list(archs)
     except Exception as e:
         print(f"Warning: Could not parse template {template_path}: {e}")
 
     return None  # No archs specified = builds for all
 
 
+# Subpackages are defined as <name>_package() functions
+_SUBPKG_RE = re.compile(r'^([\w.+-]+)_package\(\)', re.MULTILINE)
+
+
+def parse_template_subpackages(template_path):
+    """
+    Parse the subpackage names from a template file.
+    Returns an empty list if the template defines none.
+    """
+    try:
+        with open(template_path, "r") as f:
+            return _SUBPKG_RE.findall(f.read())
+    except Exception as e:
+        print(f"Warning: Could not parse template {template_path}: {e}")
+
+    return []
+
+
 def arch_supported(archs_list, target_arch):
     """
     Check if target_arch is supported given the archs list from template.
@@ -83,3 +130,11 @@ def get_positive_archs(archs_list):
         return None  # noarch means all
 
     return None  # Only negations, treat as "all supported"
+
+
+def get_build_archs(archs_list):
+    """
+    Get the architectures a package is built for: its positive archs, or
+    SUPPORTED_ARCHS when the template doesn't restrict them.
+    """
+    return get_positive_archs(archs_list) or SUPPORTED_ARCHS.copy()
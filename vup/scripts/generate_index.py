@@ -4,31 +4,61 @@ Generate the package index for VUP.
 Creates public/index.json with package metadata and URLs for both GitHub releases and R2.
 """
 
+import hashlib
 import json
 import os
 import re
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
 # Import shared config
 try:
     from config import (
         BASE_URL,
         SRCPKGS_DIR,
-        SUPPORTED_ARCHS,
-        get_positive_archs,
+        TEMPLATE_HEAD_SIZE,
+        get_build_archs,
+        list_subdirs,
         parse_template_archs,
     )
 except ImportError:
-    import sys
-
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
     from config import (
         BASE_URL,
         SRCPKGS_DIR,
-        SUPPORTED_ARCHS,
-        get_positive_archs,
+        TEMPLATE_HEAD_SIZE,
+        get_build_archs,
+        list_subdirs,
         parse_template_archs,
     )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Regex for version and revision
+# Note: This handles simple 'version=1.2.3' and 'revision=1'
+# It does NOT handle variable substitution like 'version=${_ver}'
+# Both keys are matched by one pattern so the template is scanned once
+_VER_REV_RE = re.compile(r"^(version|revision)=([^\s#]+)", re.MULTILINE)
+
+# Parse results from the last run; templates whose git blob is unchanged
+# are taken from here instead of being read again. Kept out of public/ so
+# it isn't published with the index; CI persists it with actions/cache.
+MANIFEST_PATH = ".cache/index_manifest.json"
+
+
+def _scan_version_revision(content):
+    """Returns {key: value} for the first version= and revision= lines."""
+    found = {}
+    for match in _VER_REV_RE.finditer(content):
+        found.setdefault(match.group(1), match.group(2))
+        if len(found) == 2:
+            break
+    return found
+
 
 def parse_template(template_path):
     """
@@ -39,22 +69,99 @@ def parse_template(template_path):
     revision = None
 
     with open(template_path, "r") as f:
-        content = f.read()
+        # version/revision sit near the top, so try the head first
+        content = f.read(TEMPLATE_HEAD_SIZE)
+        truncated = len(content) == TEMPLATE_HEAD_SIZE
+        # A truncated head may end mid-value; only trust complete lines
+        head = content[: content.rfind("\n") + 1] if truncated else content
 
-        # Regex for version and revision
-        # Note: This handles simple 'version=1.2.3' and 'revision=1'
-        # It does NOT handle variable substitution like 'version=${_ver}'
-        v_match = re.search(r"^version=([^\s#]+)", content, re.MULTILINE)
-        r_match = re.search(r"^revision=([^\s#]+)", content, re.MULTILINE)
+        found = _scan_version_revision(head)
 
-        if v_match:
-            version = v_match.group(1).strip("\"'")
-        if r_match:
-            revision = r_match.group(1).strip("\"'")
+        if truncated and len(found) < 2:
+            content += f.read()
+            found = _scan_version_revision(content)
+
+        if "version" in found:
+            version = found["version"].strip("\"'")
+        if "revision" in found:
+            revision = found["revision"].strip("\"'")
 
     return version, revision
 
 
+def _scan_one(template_path):
+    """
+    Parses a single template. Runs in a worker process, so it must stay
+    at module level and return plain picklable values.
+    """
+    version, revision = parse_template(template_path)
+    raw_archs = None
+    if version and revision:
+        # Parse archs from template using shared function
+        raw_archs = parse_template_archs(template_path)
+
+    return version, revision, raw_archs
+
+
+def template_blobs():
+    """
+    Returns {path: blob id} for the templates tracked by git, leaving out
+    any with uncommitted changes. Blob ids depend only on file content, so
+    unlike mtimes they stay valid across fresh checkouts. Returns {} when
+    git isn't available, which just means every template is parsed.
+    """
+    try:
+        staged = subprocess.check_output(
+            ["git", "ls-files", "-s", "-z", "--", SRCPKGS_DIR],
+            stderr=subprocess.DEVNULL,
+        ).decode()
+        modified = subprocess.check_output(
+            ["git", "ls-files", "-m", "-z", "--", SRCPKGS_DIR],
+            stderr=subprocess.DEVNULL,
+        ).decode()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return {}
+
+    dirty = set(modified.split("\0"))
+    blobs = {}
+    for entry in staged.split("\0"):
+        # <mode> <blob> <stage>\t<path>
+        info, _, path = entry.partition("\t")
+        if path.endswith("/template") and path not in dirty:
+            blobs[path] = info.split()[1]
+    return blobs
+
+
+def parser_version():
+    """
+    Hash of the code that parses templates. A manifest written by other
+    parsing code is ignored, since its results may no longer match.
+    """
+    h = hashlib.sha1()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ("generate_index.py", "config.py"):
+        with open(os.path.join(here, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def load_manifest(parser):
+    """
+    Loads the per-template results of the previous run, keyed by template
+    path as {path: [blob, version, revision, raw_archs]}. Returns {} if
+    the manifest was written by a different parser version.
+    """
+    try:
+        with open(MANIFEST_PATH, "rb") as f:
+            manifest = json.loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("parser") != parser:
+        return {}
+    templates = manifest.get("templates")
+    return templates if isinstance(templates, dict) else {}
+
+
 def generate_index():
     index = {
         "_meta": {
@@ -73,62 +180,94 @@ def generate_index():
         print(f"Error: {SRCPKGS_DIR} not found.")
         return
 
-    categories = sorted(
-        [
-            d
-            for d in os.listdir(SRCPKGS_DIR)
-            if os.path.isdir(os.path.join(SRCPKGS_DIR, d))
-        ]
-    )
+    categories = sorted(list_subdirs(SRCPKGS_DIR))
 
+    # Flatten to one task per template so the pool can spread the parsing
+    tasks = []
     for category in categories:
         cat_dir = os.path.join(SRCPKGS_DIR, category)
-        packages = sorted(
-            [d for d in os.listdir(cat_dir) if os.path.isdir(os.path.join(cat_dir, d))]
-        )
-
-        for pkg in packages:
+        for pkg in sorted(list_subdirs(cat_dir)):
             template_path = os.path.join(cat_dir, pkg, "template")
-            if not os.path.exists(template_path):
-                continue
-
-            version, revision = parse_template(template_path)
-
-            if version and revision:
-                full_version = f"{version}_{revision}"
-
-                # Parse archs from template using shared function
-                raw_archs = parse_template_archs(template_path)
-                archs = get_positive_archs(raw_archs)
-                if not archs:
-                    archs = SUPPORTED_ARCHS.copy()
-
-                # Build repo_urls dict per architecture
-                # GitHub releases hold the repodata (index) and packages
-                repo_urls = {}
-
-                for arch in archs:
-                    tag = f"{category}-{arch}-current"
-                    repo_urls[arch] = f"{BASE_URL}/{tag}"
-
-                index["packages"][pkg] = {
-                    "category": category,
-                    "version": full_version,
-                    "archs": archs,
-                    "repo_urls": repo_urls,
-                }
-                print(
+            if os.path.isfile(template_path):
+                tasks.append((category, pkg, template_path))
+
+    # Only templates changed since the last run need to be parsed
+    blobs = template_blobs()
+    parser = parser_version()
+    old_manifest = load_manifest(parser) if blobs else {}
+    results = {}
+    for _, _, template_path in tasks:
+        cached = old_manifest.get(template_path)
+        blob = blobs.get(template_path)
+        if blob and isinstance(cached, list) and len(cached) == 4 and cached[0] == blob:
+            results[template_path] = cached
+    stale = [path for _, _, path in tasks if path not in results]
+
+    if stale:
+        workers = os.cpu_count() or 1
+        chunksize = max(1, min(64, len(stale) // (workers * 4)))
+        with ProcessPoolExecutor() as ex:
+            scanned = ex.map(_scan_one, stale, chunksize=chunksize)
+            for template_path, result in zip(stale, scanned):
+                results[template_path] = [blobs.get(template_path), *result]
+
+    # Per-package lines only with VERBOSE=1; warnings are collected and
+    # written once after the summary, as per-line prints are slow on CI logs
+    verbose = os.environ.get("VERBOSE") == "1"
+    log_lines = []
+    warnings = []
+    for category, pkg, template_path in tasks:
+        _, version, revision, raw_archs = results[template_path]
+
+        if version and revision:
+            full_version = f"{version}_{revision}"
+
+            archs = get_build_archs(raw_archs)
+
+            # Build repo_urls dict per architecture
+            # GitHub releases hold the repodata (index) and packages
+            repo_urls = {}
+
+            for arch in archs:
+                tag = f"{category}-{arch}-current"
+                repo_urls[arch] = f"{BASE_URL}/{tag}"
+
+            index["packages"][pkg] = {
+                "category": category,
+                "version": full_version,
+                "archs": archs,
+                "repo_urls": repo_urls,
+            }
+            if verbose:
+                log_lines.append(
                     f"Indexed: {pkg} -> {category} ({full_version}) [{', '.join(archs)}]"
                 )
-            else:
-                print(f"Warning: Could not parse version/revision for {pkg}")
+        else:
+            warnings.append(f"Warning: Could not parse version/revision for {pkg}")
+
+    log_lines.append(
+        f"Indexed {len(index['packages'])} packages, {len(warnings)} warnings"
+    )
+    log_lines.extend(warnings)
+    sys.stdout.write("\n".join(log_lines) + "\n")
 
     # Output to public/index.json
     os.makedirs("public", exist_ok=True)
-    with open("public/index.json", "w") as f:
-        json.dump(index, f, indent=2)
+    if orjson is not None:
+        with open("public/index.json", "wb") as f:
+            f.write(orjson.dumps(index, option=orjson.OPT_INDENT_2))
+    else:
+        with open("public/index.json", "w") as f:
+            json.dump(index, f, indent=2)
     print("Generated public/index.json")
 
+    # Untracked and locally modified templates have no blob to key on
+    templates = {path: entry for path, entry in results.items() if entry[0]}
+    if templates:
+        os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+        with open(MANIFEST_PATH, "w") as f:
+            json.dump({"parser": parser, "templates": templates}, f)
+
 
 if __name__ == "__main__":
     generate_index()
@@ -6,13 +6,35 @@ Aggregates results by package across categories and architectures.
 import sys
 import json
 import os
-import glob
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_report(path):
+    """Read and parse one report file, using orjson when it is installed."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 def main():
     # Find all report files in the reports directory
     report_dir = sys.argv[1] if len(sys.argv) > 1 else "reports"
-    report_files = glob.glob(os.path.join(report_dir, "*.json"))
+    try:
+        with os.scandir(report_dir) as it:
+            report_files = [
+                e.path
+                for e in it
+                if e.name.endswith(".json") and not e.name.startswith(".") and e.is_file()
+            ]
+    except FileNotFoundError:
+        report_files = []
     
     if not report_files:
         print("No report files found.")
@@ -21,10 +43,13 @@ def main():
     # Structure: {category: {package: {arch: {status, duration, error_log}}}}
     aggregated = defaultdict(lambda: defaultdict(dict))
     
-    for report_file in report_files:
+    # Reports are independent, so read and parse them concurrently
+    with ThreadPoolExecutor(max_workers=min(32, len(report_files))) as ex:
+        loading = [(path, ex.submit(load_report, path)) for path in report_files]
+    
+    for report_file, future in loading:
         try:
-            with open(report_file, 'r') as f:
-                data = json.load(f)
+            data = future.result()
             
             cat = data.get("category", "unknown")
             arch = data.get("arch", "unknown")
@@ -54,26 +79,19 @@ def main():
     # Store errors to print after tables
     errors = []
     
+    # Header with arch columns is the same for every category
+    header = "| Package | " + " | ".join(all_archs) + " |"
+    separator = "|---------|" + "----------|" * len(all_archs)
+    
     # Generate summary per category
     for cat in sorted(aggregated.keys()):
         packages = aggregated[cat]
         
-        print(f"## Category: `{cat}`")
-        print()
-        
-        # Build header with arch columns
-        header = "| Package |"
-        separator = "|---------|"
-        for arch in all_archs:
-            header += f" {arch} |"
-            separator += "----------|"
-        
-        print(header)
-        print(separator)
+        lines = [f"## Category: `{cat}`", "", header, separator]
         
         for pkg in sorted(packages.keys()):
             arch_results = packages[pkg]
-            row = f"| {pkg} |"
+            cells = [pkg]
             
             for arch in all_archs:
                 if arch in arch_results:
@@ -82,9 +100,9 @@ def main():
                     duration = result["duration"]
                     
                     if status == "success":
-                        row += f" ✅ {duration:.1f}s |"
+                        cells.append(f"✅ {duration:.1f}s")
                     else:
-                        row += f" ❌ {duration:.1f}s |"
+                        cells.append(f"❌ {duration:.1f}s")
                         # Collect error for later
                         if result.get("error_log"):
                             errors.append({
@@ -94,11 +112,12 @@ def main():
                                 "log": result["error_log"]
                             })
                 else:
-                    row += " — |"  # Not built for this arch
+                    cells.append("—")  # Not built for this arch
             
-            print(row)
+            lines.append("| " + " | ".join(cells) + " |")
         
-        print()
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
     
     # Print errors after all tables (so they don't break table formatting)
     if errors:
@@ -3,15 +3,29 @@
 Manage VUP releases - handles both GitHub releases (repodata) and Cloudflare R2 (packages).
 """
 
-import glob
+import http.client
 import json
 import os
+import plistlib
 import re
 import subprocess
 import sys
-from functools import cmp_to_key
+import tarfile
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from typing import Literal, overload
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # Configuration from environment
 REPO: str = os.environ.get("GITHUB_REPOSITORY", "")
 CATEGORY: str = os.environ.get("CATEGORY", "")
@@ -19,17 +33,40 @@ ARCH: str = os.environ.get("ARCH", "x86_64")
 TAG_NAME: str = f"{CATEGORY}-{ARCH}-current"
 DIST_DIR: str = "dist"
 
+# download and clean_remote run in the same CI job, so the asset listing
+# fetched by the first is reused by the second instead of asking the API again
+RELEASE_CACHE: str = os.path.join(
+    tempfile.gettempdir(), f"gh-release-{REPO.replace('/', '_')}-{TAG_NAME}.json"
+)
+RELEASE_CACHE_MAX_AGE: int = 3600
 
-@overload
-def run_command(cmd: list[str], capture_output: Literal[True]) -> str | None: ...
+
+# <name>-<version>_<revision>.<arch>.xbps
+_PKG_NAME_RE = re.compile(r"^(.*)-([0-9][^-]*)\.[^.]*\.xbps$")
+_PKG_VER_RE = re.compile(r"-([0-9][^-]*_[0-9]+)\.[^.]*\.xbps$")
+# Characters gh treats specially in --pattern globs
+_GLOB_SPECIAL_RE = re.compile(r"([*?\[\\])")
 
 
 @overload
-def run_command(cmd: list[str], capture_output: Literal[False] = False) -> bool | None: ...
+def run_command(
+    cmd: list[str], capture_output: Literal[True], errlog: bool = True
+) -> str | None: ...
 
 
-def run_command(cmd: list[str], capture_output: bool = False) -> str | bool | None:
-    """Run a command, returning output string if capture_output, True on success, None on failure."""
+@overload
+def run_command(
+    cmd: list[str], capture_output: Literal[False] = False, errlog: bool = True
+) -> bool | None: ...
+
+
+def run_command(
+    cmd: list[str], capture_output: bool = False, errlog: bool = True
+) -> str | bool | None:
+    """
+    Run a command, returning output string if capture_output, True on success, None on failure.
+    Failures are reported unless capture_output is set or errlog is False.
+    """
     try:
         if capture_output:
             return (
@@ -38,11 +75,52 @@ def run_command(cmd: list[str], capture_output: bool = False) -> str | bool | No
         subprocess.check_call(cmd)
         return True
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        if not capture_output:
+        if not capture_output and errlog:
             print(f"Command failed: {e}")
         return None
 
 
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+@lru_cache(maxsize=None)
+def read_pkg_props(filename: str) -> tuple[str, str] | None:
+    """
+    Read (pkgname, version_revision) from the props.plist inside a binpkg,
+    without forking xbps-uhelper. Returns None if it can't be read, e.g.
+    for zstd packages when the zstandard module isn't installed.
+    """
+    try:
+        with open(filename, "rb") as f:
+            if f.read(4) == _ZSTD_MAGIC:
+                if zstandard is None:
+                    return None
+                f.seek(0)
+                stream, mode = zstandard.ZstdDecompressor().stream_reader(f), "r|"
+            else:
+                f.seek(0)
+                stream, mode = f, "r|*"
+            with tarfile.open(fileobj=stream, mode=mode) as tf:
+                # xbps-create writes the optional INSTALL and REMOVE scripts
+                # before props.plist, so it is at most the third member
+                for member in islice(tf, 3):
+                    if member.name.lstrip("./") == "props.plist":
+                        break
+                else:
+                    return None
+                props = plistlib.loads(tf.extractfile(member).read())
+    except Exception:
+        return None
+
+    name, pkgver = props.get("pkgname"), props.get("pkgver")
+    if not name or not pkgver or not pkgver.startswith(name + "-"):
+        return None
+    return name, pkgver[len(name) + 1 :]
+
+
+# Both helpers are memoized per path, so a file is parsed (and any
+# xbps-uhelper fork behind it runs) at most once per run
+@lru_cache(maxsize=None)
 def get_pkg_name(filename):
     # Also skip xbps-uhelper for .xbps files as it expects pkgver string
     if os.path.exists(filename) and not filename.endswith(".xbps"):
@@ -53,71 +131,120 @@ def get_pkg_name(filename):
     # Fallback/Remote logic
     # Match <name>-<version>_<revision>.<arch>.xbps
     # Find last hyphen before a digit
-    match = re.search(r"^(.*)-([0-9][^-]*)\.[^.]*\.xbps$", os.path.basename(filename))
+    match = _PKG_NAME_RE.search(filename.rsplit("/", 1)[-1])
     if match:
         return match.group(1)
+
+    # Non-standard name: ask the package itself
+    props = read_pkg_props(filename) if filename.endswith(".xbps") else None
+    if props:
+        return props[0]
     return None
 
 
+@lru_cache(maxsize=None)
 def get_pkg_ver(filename):
-    # Try xbps-uhelper first
+    # Standard <name>-<version>_<revision>.<arch>.xbps names carry the
+    # version already; otherwise read the package's props.plist, and only
+    # fork xbps-uhelper when that fails too
+    base = filename.rsplit("/", 1)[-1]
+    match = _PKG_VER_RE.search(base)
+    if match:
+        return match.group(1)
+
+    props = read_pkg_props(filename) if base.endswith(".xbps") else None
+    if props:
+        return props[1]
+
     if os.path.exists(filename):
         res = run_command(["xbps-uhelper", "binpkgver", filename], capture_output=True)
         if res:
             return res
 
-    # Fallback regex extraction from filename
-    # <name>-<version>_<revision>.<arch>.xbps
-    base = os.path.basename(filename)
-    match = re.search(r"-([0-9][^-]*_[0-9]+)\.[^.]*\.xbps$", base)
-    if match:
-        return match.group(1)
-
     return None
 
 
-def parse_ver_rev(version_str):
-    """Splits version_revision string into (version, revision_int)."""
-    if "_" in version_str:
-        ver, rev = version_str.rsplit("_", 1)
-        try:
-            return ver, int(rev)
-        except ValueError:
-            return ver, 0
-    return version_str, 0
-
-
-def python_ver_cmp(v1, v2):
-    """Fallback comparison logic."""
-    ver1, rev1 = parse_ver_rev(v1)
-    ver2, rev2 = parse_ver_rev(v2)
-
-    if ver1 == ver2:
-        return 1 if rev1 > rev2 else (-1 if rev1 < rev2 else 0)
-
-    # Simple version comparison - split by common separators and compare parts
-    def normalize(v):
-        # Split version string into comparable parts
-        parts = re.split(r"[._-]", v)
-        result = []
-        for p in parts:
-            # Try to convert to int for numeric comparison
-            try:
-                result.append((0, int(p)))
-            except ValueError:
-                result.append((1, p))  # String parts sort after numbers
-        return result
-
+# Tokens of xbps' version comparison (lib/dewey.c), in the order it tries
+# them: digit runs, modifiers, the _revision suffix, then single letters
+_DEWEY_TOKEN_RE = re.compile(
+    r"(\d+)|(alpha|beta|pre|rc|pl|\.)|(_\d*)|([a-z])|.", re.IGNORECASE | re.ASCII
+)
+_DEWEY_MODIFIERS = {"alpha": -3, "beta": -2, "pre": -1, "rc": -1, "pl": 0, ".": 0}
+
+
+@lru_cache(maxsize=4096)
+def _version_key(version_str):
+    """
+    Sort key that orders version_revision strings like xbps-uhelper cmpver,
+    so a group of files can be sorted without forking per comparison.
+    Cached, so each distinct version string is only parsed once per run.
+    """
+    parts = []
+    revision = 0
+    for number, modifier, rev, letter in _DEWEY_TOKEN_RE.findall(version_str):
+        if number:
+            parts.append(int(number))
+        elif modifier:
+            parts.append(_DEWEY_MODIFIERS[modifier.lower()])
+        elif letter:
+            # 1.0a is 1.0.0.1: a letter is a dot followed by its position
+            parts.extend((0, ord(letter.lower()) - ord("a") + 1))
+        elif rev:
+            revision = int(rev[1:] or 0)
+
+    # xbps compares the parts as if the shorter list were padded with
+    # zeros. Pairing each part with the sign of the first non-zero part
+    # from there on, and ending with (0,), gives the same order under
+    # plain tuple comparison.
+    while parts and parts[-1] == 0:
+        parts.pop()
+    key = []
+    sign = 0
+    for value in reversed(parts):
+        if value:
+            sign = 1 if value > 0 else -1
+        key.append((sign, value))
+    key.reverse()
+    key.append((0,))
+    return tuple(key), revision
+
+
+def _unlink_if_exists(path: str) -> None:
+    """Remove a file, treating one that is already gone as removed."""
     try:
-        n1, n2 = normalize(ver1), normalize(ver2)
-        if n1 > n2:
-            return 1
-        if n1 < n2:
-            return -1
-    except Exception:
+        os.unlink(path)
+    except FileNotFoundError:
         pass
 
-    return 1 if v1 > v2 else -1
+
+def drop_release_cache() -> None:
+    _unlink_if_exists(RELEASE_CACHE)
+
+
+def fetch_release_assets() -> list[dict] | None:
+    """Fetch the asset list of TAG_NAME and cache it. None if the release is missing."""
+    json_str = run_command(
+        ["gh", "release", "view", TAG_NAME, "--repo", REPO, "--json", "assets"],
+        capture_output=True,
+    )
+    if not json_str:
+        drop_release_cache()
+        return None
+    assets = json.loads(json_str).get("assets", [])
+    with open(RELEASE_CACHE, "w") as f:
+        f.write(json_str)
+    return assets
+
+
+def release_assets() -> list[dict] | None:
+    """Asset list of TAG_NAME, from the cache when it is recent enough."""
+    try:
+        if time.time() - os.path.getmtime(RELEASE_CACHE) < RELEASE_CACHE_MAX_AGE:
+            with open(RELEASE_CACHE) as f:
+                return json.load(f).get("assets", [])
+    except (OSError, ValueError):
+        pass
+    return fetch_release_assets()
 
 
 def download_release():
@@ -128,131 +255,209 @@ def download_release():
         print("ERROR: GITHUB_REPOSITORY not set")
         return
 
-    # Check if release exists
-    if not run_command(
-        ["gh", "release", "view", TAG_NAME, "--repo", REPO], capture_output=True
-    ):
+    # Check if release exists (this also caches its asset list)
+    assets = fetch_release_assets()
+    if assets is None:
         print(f"Release {TAG_NAME} not found. Starting fresh.")
         return
 
-    run_command(
-        [
-            "gh",
-            "release",
-            "download",
-            TAG_NAME,
-            "--repo",
-            REPO,
-            "--dir",
-            DIST_DIR,
-            "--pattern",
-            "*",
-        ]
-    )
-
+    # Only fetch assets that aren't already here with the same size
+    local = scan_dist()
+    wanted = []
+    for asset in assets:
+        entry = local.get(asset["name"])
+        if entry is None or entry.stat().st_size != asset.get("size"):
+            wanted.append(asset)
 
-def xbps_ver_cmp(f1, f2):
-    v1 = get_pkg_ver(f1)
-    v2 = get_pkg_ver(f2)
-
-    if not v1 or not v2:
-        print(f"Warning: Could not determine version for {f1} or {f2}")
-        return 0
-
-    # Python Fallback for same version different revision (most common cleanup case)
-    val1, rev1 = parse_ver_rev(v1)
-    val2, rev2 = parse_ver_rev(v2)
-
-    if val1 == val2:
-        return 1 if rev1 > rev2 else (-1 if rev1 < rev2 else 0)
+    if not wanted:
+        print("All release assets are already present.")
+        return
 
-    # Try xbps-uhelper cmpver for different versions
+    # Number of gh processes used to fetch the assets in parallel
     try:
-        ret = subprocess.call(
-            ["xbps-uhelper", "cmpver", v1, v2],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-        if ret == 1:
-            return 1
-        if ret == 255:
-            return -1
-    except Exception:
-        pass
+        download_jobs = max(1, int(os.environ.get("DOWNLOAD_JOBS", "4")))
+    except ValueError:
+        download_jobs = 4
+
+    cmd = ["gh", "release", "download", TAG_NAME, "--repo", REPO, "--dir", DIST_DIR]
+    if len(wanted) == len(assets) and len(wanted) < 2 * download_jobs:
+        # Every asset may still be here with the wrong size, so overwrite
+        run_command(cmd + ["--clobber", "--pattern", "*"])
+        return
 
-    return python_ver_cmp(v1, v2)
+    if len(wanted) < len(assets):
+        print(f"Fetching {len(wanted)} of {len(assets)} assets.")
+
+    # Spread the assets over several gh processes, biggest first onto the
+    # least loaded one, so the transfers overlap
+    jobs = [[] for _ in range(min(download_jobs, len(wanted)))]
+    loads = [0] * len(jobs)
+    for asset in sorted(wanted, key=lambda a: a.get("size") or 0, reverse=True):
+        i = loads.index(min(loads))
+        jobs[i].append(asset["name"])
+        loads[i] += asset.get("size") or 0
+
+    def download(names):
+        patterns = []
+        for name in names:
+            patterns += ["--pattern", _GLOB_SPECIAL_RE.sub(r"\\\1", name)]
+        # Mismatched local copies get replaced
+        return run_command(cmd + ["--clobber"] + patterns)
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as ex:
+        list(ex.map(download, jobs))
+
+
+def _file_version_key(filename):
+    version = get_pkg_ver(filename)
+    if not version:
+        # Unknown versions sort as the oldest
+        print(f"Warning: Could not determine version for {filename}")
+        return (), -1
+    return _version_key(version)
+
+
+def scan_dist():
+    """
+    List DIST_DIR once as {name: DirEntry}, skipping hidden files.
+    DirEntry caches its stat, so the passes sharing a listing stat each
+    file at most once. Returns {} if DIST_DIR doesn't exist.
+    """
+    try:
+        with os.scandir(DIST_DIR) as it:
+            return {e.name: e for e in it if not e.name.startswith(".")}
+    except FileNotFoundError:
+        return {}
 
 
-def clean_stale_sigs():
+def clean_stale_sigs(entries=None):
     """Remove signatures for packages that have been rebuilt (sig is older than pkg)."""
     print("Cleaning stale signatures...")
-    for pkg in glob.glob(os.path.join(DIST_DIR, "*.xbps")):
+    if entries is None:
+        entries = scan_dist()
+
+    for name, pkg in list(entries.items()):
+        if not name.endswith(".xbps"):
+            continue
         for ext in [".sig", ".sig2"]:
-            sig = pkg + ext
-            if os.path.exists(sig):
+            sig = entries.get(name + ext)
+            if sig is not None:
                 # If signature is older than the package, it's stale
-                pkg_mtime = os.path.getmtime(pkg)
-                sig_mtime = os.path.getmtime(sig)
-                if sig_mtime < pkg_mtime:
-                    print(f"Removing stale signature: {os.path.basename(sig)}")
-                    os.remove(sig)
-
-
-def prune_local():
-    """Keep only the latest version of each package in DIST_DIR."""
+                if sig.stat().st_mtime < pkg.stat().st_mtime:
+                    print(f"Removing stale signature: {sig.name}")
+                    _unlink_if_exists(sig.path)
+                    del entries[sig.name]
+
+
+def prune_local(entries=None):
+    """
+    Keep only the latest version of each package in DIST_DIR.
+    entries is a scan_dist() listing; removed files are dropped from it
+    so it can be passed on to the next pass.
+    """
     print("Pruning local old versions...")
-    files = glob.glob(os.path.join(DIST_DIR, "*.xbps"))
+    if entries is None:
+        entries = scan_dist()
 
     # 1. Prune duplicate/old versions
-    pkgs = {}
-    if files:
-        for f in files:
-            name = get_pkg_name(f)
-            if name:
-                pkgs.setdefault(name, []).append(f)
-            else:
-                print(
-                    f"Warning: Could not determine package name for {os.path.basename(f)}"
-                )
-
-    for name, fpaths in pkgs.items():
-        if len(fpaths) > 1:
-            fpaths.sort(key=cmp_to_key(xbps_ver_cmp), reverse=True)
-            print(f"Versions for {name}: {[os.path.basename(fv) for fv in fpaths]}")
-
-            for old in fpaths[1:]:
-                print(f"Removing old version: {os.path.basename(old)}")
-                os.remove(old)
-                if os.path.exists(old + ".sig"):
-                    os.remove(old + ".sig")
-                if os.path.exists(old + ".sig2"):
-                    os.remove(old + ".sig2")
+    pkgs = defaultdict(list)
+    for basename, entry in entries.items():
+        if not basename.endswith(".xbps"):
+            continue
+        name = get_pkg_name(entry.path)
+        if name:
+            pkgs[name].append(entry.path)
+        else:
+            print(f"Warning: Could not determine package name for {basename}")
+
+    # Usually every package has a single version; only duplicates need work
+    dups = {name: fpaths for name, fpaths in pkgs.items() if len(fpaths) > 1}
+    for name, fpaths in dups.items():
+        # Decorate once per file; equal versions fall back to the path
+        # so the kept file doesn't depend on directory order
+        keyed = sorted(((_file_version_key(f), f) for f in fpaths), reverse=True)
+        fpaths = [f for _, f in keyed]
+        print(f"Versions for {name}: {[os.path.basename(fv) for fv in fpaths]}")
+
+        for old in fpaths[1:]:
+            basename = os.path.basename(old)
+            print(f"Removing old version: {basename}")
+            # Signatures go first so a concurrent reader never sees a
+            # sig whose package is already gone
+            for ext in [".sig", ".sig2"]:
+                if basename + ext in entries:
+                    _unlink_if_exists(old + ext)
+                    del entries[basename + ext]
+            _unlink_if_exists(old)
+            del entries[basename]
 
     # 2. Clean orphaned signatures and other artifacts
     print("Cleaning orphaned files...")
-    all_files = glob.glob(os.path.join(DIST_DIR, "*"))
-    for f in all_files:
-        if os.path.isdir(f):
+    for basename, entry in list(entries.items()):
+        if entry.is_dir():
             continue
-        if f.endswith(".xbps"):
+        if basename.endswith(".xbps"):
             continue
 
         # Skip repodata files
-        basename = os.path.basename(f)
         if basename == "repodata" or basename.startswith("repodata."):
             continue
 
         # Check if it is a signature for a missing package
         parent = None
-        if f.endswith(".sig"):
-            parent = f[:-4]
-        elif f.endswith(".sig2"):
-            parent = f[:-5]
+        if basename.endswith(".sig"):
+            parent = basename[:-4]
+        elif basename.endswith(".sig2"):
+            parent = basename[:-5]
 
         if parent:
-            if not os.path.exists(parent):
+            if parent not in entries:
                 print(f"Removing orphaned signature: {basename}")
-                os.remove(f)
+                _unlink_if_exists(entry.path)
+                del entries[basename]
+
+
+_api_local = threading.local()
+
+
+def _api_connect(parts: urllib.parse.SplitResult) -> http.client.HTTPConnection:
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.netloc, timeout=60)
+    return http.client.HTTPConnection(parts.netloc, timeout=60)
+
+
+def api_delete(url: str, token: str) -> int:
+    """
+    Send an authenticated DELETE to a GitHub REST URL and return the status.
+    Each thread keeps its connection open, so a batch of deletions pays
+    for the TLS handshake once per worker rather than once per asset.
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+        "User-Agent": "vup-manage-release",
+    }
+
+    def send(conn):
+        conn.request("DELETE", path, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+
+    conns = _api_local.__dict__.setdefault("conns", {})
+    key = (parts.scheme, parts.netloc)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = _api_connect(parts)
+    try:
+        return send(conn)
+    except (http.client.HTTPException, OSError):
+        # The server may have dropped a kept-alive connection; retry once
+        conn.close()
+        conn = conns[key] = _api_connect(parts)
+        return send(conn)
 
 
 def clean_remote_assets():
@@ -264,39 +469,69 @@ def clean_remote_assets():
         return
 
     try:
-        json_str = run_command(
-            ["gh", "release", "view", TAG_NAME, "--repo", REPO, "--json", "assets"],
-            capture_output=True,
-        )
-        if not json_str or not isinstance(json_str, str):
+        assets = release_assets()
+        if assets is None:
             raise ValueError("No response from gh release view")
-        data = json.loads(json_str)
-        remote_assets = {a["name"]: a for a in data.get("assets", [])}
+        # REST URL of each asset, so deletions can skip the gh round trip
+        asset_urls = {a["name"]: a.get("apiUrl") for a in assets}
+        remote_assets = set(asset_urls)
     except Exception:
         print("Could not fetch remote assets (maybe release doesn't exist yet).")
         return
 
-    local_assets = set(
-        os.path.basename(f) for f in glob.glob(os.path.join(DIST_DIR, "*"))
-    )
+    local_assets = set(scan_dist())
 
-    print(f"Local assets in {DIST_DIR}: {sorted(local_assets)}")
-    print(f"Remote assets: {sorted(remote_assets.keys())}")
+    # Full listings can run to thousands of names; only dump them on request
+    if os.environ.get("VERBOSE") == "1":
+        print(f"Local assets in {DIST_DIR}: {sorted(local_assets)}")
+        print(f"Remote assets: {sorted(remote_assets)}")
+    else:
+        print(f"Local assets in {DIST_DIR}: {len(local_assets)}")
+        print(f"Remote assets: {len(remote_assets)}")
 
-    to_delete = []
-    for r_name in remote_assets:
-        if r_name not in local_assets:
-            to_delete.append(r_name)
+    to_delete = sorted(remote_assets - local_assets)
 
     if not to_delete:
         print("Remote is clean.")
         return
 
-    for asset in to_delete:
-        print(f"Deleting remote asset: {asset}")
-        run_command(
-            ["gh", "release", "delete-asset", TAG_NAME, asset, "--repo", REPO, "--yes"]
-        )
+    sys.stdout.write(
+        "".join(f"Deleting remote asset: {asset}\n" for asset in to_delete)
+    )
+    sys.stdout.flush()
+
+    token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+
+    # Each deletion is an independent API round trip. Failures are
+    # collected and reported together rather than logged per asset.
+    def delete_asset(asset):
+        """Returns None on success, or why the asset could not be deleted."""
+        error = None
+        api_url = asset_urls.get(asset)
+        if token and api_url:
+            try:
+                status = api_delete(api_url, token)
+                if status in (204, 404):
+                    return None  # 404: already gone
+                error = f"HTTP {status}"
+            except (http.client.HTTPException, OSError) as e:
+                error = str(e)
+        if run_command(
+            ["gh", "release", "delete-asset", TAG_NAME, asset, "--repo", REPO, "--yes"],
+            errlog=False,
+        ):
+            return None
+        return f"{error}; gh delete-asset failed" if error else "gh delete-asset failed"
+
+    with ThreadPoolExecutor(max_workers=min(8, len(to_delete))) as ex:
+        errors = list(ex.map(delete_asset, to_delete))
+
+    failed = [(asset, error) for asset, error in zip(to_delete, errors) if error]
+    if failed:
+        print(f"Failed to delete {len(failed)} of {len(to_delete)} remote assets:")
+        sys.stdout.write("".join(f"  {asset}: {error}\n" for asset, error in failed))
+    # The cached listing no longer matches the release
+    drop_release_cache()
 
 
 # ============================================================================
@@ -317,8 +552,10 @@ if __name__ == "__main__":
     if cmd == "download":
         download_release()
     elif cmd == "prune":
-        prune_local()
-        clean_stale_sigs()
+        # Both passes share one listing of DIST_DIR
+        entries = scan_dist()
+        prune_local(entries)
+        clean_stale_sigs(entries)
     elif cmd == "clean_remote":
         clean_remote_assets()
     else:
@@ -5,6 +5,18 @@ import sys
 import os
 
 
+def read_tail(path, max_lines, max_bytes=65536):
+    """Return the last max_lines lines of a file, reading at most max_bytes from its end."""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - max_bytes))
+        lines = f.read().splitlines(keepends=True)
+    if size > max_bytes:
+        # The first line is probably cut off
+        lines = lines[1:]
+    return b''.join(lines[-max_lines:]).decode(errors='replace')
+
+
 def main():
     report_file = sys.argv[1]
     pkg = sys.argv[2]
@@ -14,9 +26,7 @@ def main():
     log_content = ''
     if os.path.exists(log_file):
         try:
-            with open(log_file, 'r', errors='replace') as f:
-                lines = f.readlines()
-                log_content = ''.join(lines[-50:])
+            log_content = read_tail(log_file, 50)
         except Exception as e:
             log_content = f'Error reading log: {e}'
 
@@ -36,6 +36,17 @@ OPTIONAL_FIELDS = [
     "makedepends",
 ]
 
+# Match shell variable assignments at any indentation level.
+# Required fields may be inside case/esac blocks (e.g. distfiles).
+ASSIGNMENT_RE = re.compile(r'^\s*(\w+)=(.*)', re.MULTILINE)
+
+# Distfile names that point at arch-specific prebuilt binaries
+BINARY_ARCHIVE_PATTERNS = [
+    re.compile(r"\.(appimage|deb|rpm)(?:[>\s\"']|$)"),
+    re.compile(r"(?:^|[-_/])(linux|unknown-linux|pc-linux|linux-gnu|linux-musl)(?:[-_/]|$)"),
+    re.compile(r"(?:^|[-_/])(x86_64|amd64|aarch64|arm64|x64)(?:[-_/\.]|$)"),
+]
+
 
 def parse_template(path):
     """Parse a template file and return a dict of field -> value."""
@@ -47,10 +58,7 @@ def parse_template(path):
         print(f"ERROR: Cannot read {path}: {e}")
         return None
 
-    # Match shell variable assignments at any indentation level.
-    # Required fields may be inside case/esac blocks (e.g. distfiles).
-    pattern = re.compile(r'^\s*(\w+)=(.*)', re.MULTILINE)
-    for match in pattern.finditer(content):
+    for match in ASSIGNMENT_RE.finditer(content):
         key = match.group(1)
         value = match.group(2).strip()
         # Strip quotes if present
@@ -91,16 +99,11 @@ def check_noshlibprovides(fields, raw_content, path):
         return None
 
     app_keywords = ("browser", "editor", "ide", "electron")
-    binary_archive_patterns = [
-        r"\.(appimage|deb|rpm)(?:[>\s\"']|$)",
-        r"(?:^|[-_/])(linux|unknown-linux|pc-linux|linux-gnu|linux-musl)(?:[-_/]|$)",
-        r"(?:^|[-_/])(x86_64|amd64|aarch64|arm64|x64)(?:[-_/\.]|$)",
-    ]
 
     # Heuristics for prebuilt/electron apps and arch-specific binary archives.
     prebuilt_indicators = [
         any(word in short_desc or word in pkgname for word in app_keywords),
-        any(re.search(pattern, distfiles) for pattern in binary_archive_patterns),
+        any(pattern.search(distfiles) for pattern in BINARY_ARCHIVE_PATTERNS),
     ]
 
     if any(prebuilt_indicators):